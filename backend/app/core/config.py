@@ -9,6 +9,8 @@ class Settings(BaseSettings):
     jwt_secret: str
     environment: str = "development"
     disable_ssl: bool = True
+    archive_dir: str = "archive"
+    archive_retention_days: int = 180
     
     class Config:
         env_file = ".env"
@@ -1,4 +1,5 @@
 from fastapi import APIRouter, Depends, HTTPException
+from fastapi.concurrency import run_in_threadpool
 from app.models.session import SessionCreate, SessionResponse, FrameData, SessionSummary
 from app.core.auth import get_current_user
 from app.services.database_service import db_service
@@ -29,7 +30,7 @@ async def submit_frame(session_id: str, frame_data: FrameData, current_user: dic
             raise HTTPException(status_code=400, detail="Failed to save frame data")
         
         # Get session history for context
-        session_summary = db_service.get_session_summary(session_id, current_user.id)
+        session_summary = await run_in_threadpool(db_service.get_session_summary, session_id, current_user.id)
         if not session_summary:
             raise HTTPException(status_code=404, detail="Session not found")
         
@@ -59,7 +60,7 @@ async def submit_frame(session_id: str, frame_data: FrameData, current_user: dic
 async def get_session_summary(session_id: str, current_user: dict = Depends(get_current_user)):
     """Get complete session summary"""
     try:
-        summary = db_service.get_session_summary(session_id, current_user.id)
+        summary = await run_in_threadpool(db_service.get_session_summary, session_id, current_user.id)
         if not summary:
             raise HTTPException(status_code=404, detail="Session not found")
         
@@ -0,0 +1,240 @@
+from app.core.database import supabase_admin
+from app.core.config import settings
+from postgrest.exceptions import APIError
+from typing import Dict, Iterator, List, Optional
+from datetime import date, datetime, timedelta
+from pathlib import Path
+import gzip
+import json
+import logging
+import os
+import shutil
+
+logger = logging.getLogger(__name__)
+
+class ArchiveService:
+    """Moves old frames/feedback partitions to compressed files on local disk.
+
+    Each archived partition is a directory holding one gzip-compressed JSON lines
+    file per session, e.g. archive/frames/frames_p202501/<session_id>.jsonl.gz.
+    """
+
+    PARTITIONED_TABLES = ("frames", "feedback")
+    PAGE_SIZE = 1000
+    PURGE_BATCH_SIZE = 100
+
+    def __init__(self, archive_dir: Optional[str] = None, retention_days: Optional[int] = None):
+        self.archive_dir = Path(archive_dir or settings.archive_dir)
+        self.retention_days = retention_days if retention_days is not None else settings.archive_retention_days
+
+    def retention_cutoff(self) -> datetime:
+        """Rows created before this point may only exist in the archive"""
+        return datetime.utcnow() - timedelta(days=self.retention_days)
+
+    def archive_expired_partitions(self) -> List[Dict]:
+        """Export partitions older than the retention window, then drop them"""
+        archived = []
+        cutoff = self.retention_cutoff()
+        oldest_live_month = date(cutoff.year, cutoff.month, 1).isoformat()
+
+        for table in self.PARTITIONED_TABLES:
+            # Keep future partitions in place and move stray rows out of the default partition,
+            # without re-creating months that may already have been archived
+            moved = supabase_admin.rpc("ensure_time_partitions", {
+                "parent": table,
+                "cutoff": cutoff.isoformat()
+            }).execute()
+            if moved.data:
+                logger.warning("Moved %s rows of %s out of the default partition", moved.data, table)
+
+            expired = supabase_admin.rpc("list_expired_partitions", {
+                "parent": table,
+                "cutoff": cutoff.isoformat()
+            }).execute()
+            for partition in expired.data or []:
+                try:
+                    rows = self._export_partition(table, partition)
+                except RuntimeError as e:
+                    logger.error("Not dropping %s: %s", partition["partition_name"], e)
+                    continue
+
+                try:
+                    supabase_admin.rpc("drop_time_partition", {
+                        "parent": table,
+                        "partition_name": partition["partition_name"]
+                    }).execute()
+                except APIError as e:
+                    # e.g. lock_timeout; the partition is archived again and dropped on the next run
+                    logger.error("Failed to drop %s: %s", partition["partition_name"], e)
+                    continue
+                archived.append({"table": table, "partition": partition["partition_name"], "rows": rows})
+
+            remaining = supabase_admin.table(table).select("id", count="exact").lt(
+                "created_at", oldest_live_month
+            ).limit(1).execute().count
+            if remaining:
+                logger.warning(
+                    "%s rows of %s created before %s are not archived (failed drop or default partition)",
+                    remaining, table, oldest_live_month
+                )
+
+        return archived
+
+    def purge_deleted_sessions(self) -> int:
+        """Delete archived rows of sessions that no longer exist (e.g. deleted users)"""
+        paths_by_session: Dict[str, List[Path]] = {}
+        for path in self.archive_dir.glob("*/*/*.jsonl.gz"):
+            if path.parent.suffix == ".tmp":
+                continue
+            session_id = path.name[:-len(".jsonl.gz")]
+            paths_by_session.setdefault(session_id, []).append(path)
+
+        session_ids = sorted(paths_by_session)
+        purged = 0
+        for i in range(0, len(session_ids), self.PURGE_BATCH_SIZE):
+            batch = session_ids[i:i + self.PURGE_BATCH_SIZE]
+            result = supabase_admin.table("sessions").select("id").in_("id", batch).execute()
+            existing = {row["id"] for row in result.data}
+
+            for session_id in batch:
+                if session_id not in existing:
+                    for path in paths_by_session[session_id]:
+                        path.unlink()
+                    purged += 1
+
+        return purged
+
+    def get_archived_rows(self, table: str, session: Dict) -> List[Dict]:
+        """Get archived rows of a table for a session, empty if nothing was archived"""
+        start = self._parse_date(session["start_time"])
+        cutoff = self.retention_cutoff()
+        if datetime(start.year, start.month, start.day) >= cutoff:
+            return []
+
+        # Frames can be added to an open session in any later month, so read every
+        # archived month that has a file for this session
+        rows = []
+        for path in sorted((self.archive_dir / table).glob(f"{table}_p??????/{session['id']}.jsonl.gz")):
+            with gzip.open(path, "rt", encoding="utf-8") as archive:
+                rows.extend(json.loads(line) for line in archive)
+
+        month = date(start.year, start.month, 1)
+        next_month = self._next_month(month)
+        while datetime(next_month.year, next_month.month, 1) <= cutoff:
+            partition_dir = self._partition_dir(table, month)
+            if not partition_dir.exists():
+                # The partition should have been archived; rows may be missing from the summary
+                logger.warning(
+                    "No archive found for %s (session %s); is ARCHIVE_DIR shared with the retention job?",
+                    partition_dir, session["id"]
+                )
+            month, next_month = next_month, self._next_month(next_month)
+
+        return rows
+
+    def _export_partition(self, table: str, partition: Dict) -> int:
+        """Write a partition to per-session files, raising if not every row was exported"""
+        partition_dir = self._partition_dir(table, self._parse_date(partition["range_start"]))
+        tmp_dir = partition_dir.with_name(partition_dir.name + ".tmp")
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        tmp_dir.mkdir(parents=True)
+
+        rows = 0
+        for session_id in self._partition_sessions(table, partition):
+            with gzip.open(tmp_dir / f"{session_id}.jsonl.gz", "wt", encoding="utf-8") as archive:
+                for row in self._session_rows(table, partition, session_id):
+                    archive.write(json.dumps(row) + "\n")
+                    rows += 1
+
+        expected = supabase_admin.table(table).select("id", count="exact").gte(
+            "created_at", partition["range_start"]
+        ).lt(
+            "created_at", partition["range_end"]
+        ).limit(1).execute().count
+
+        if rows != expected:
+            shutil.rmtree(tmp_dir)
+            raise RuntimeError(f"exported {rows} of {expected} rows")
+
+        # Only publish complete exports; the partition is dropped after this succeeds.
+        # Merge into an existing archive (a re-run after a failed drop, or a month
+        # re-created from the default partition) instead of replacing it.
+        partition_dir.mkdir(parents=True, exist_ok=True)
+        for path in tmp_dir.iterdir():
+            target = partition_dir / path.name
+            if target.exists():
+                self._merge_archive(path, target)
+            os.replace(path, target)
+        tmp_dir.rmdir()
+        return rows
+
+    def _merge_archive(self, path: Path, existing: Path):
+        """Rewrite an export file to also hold the rows of an existing archive file"""
+        merged = {}
+        for source in (existing, path):
+            with gzip.open(source, "rt", encoding="utf-8") as archive:
+                for line in archive:
+                    row = json.loads(line)
+                    merged[row["id"]] = row
+
+        with gzip.open(path, "wt", encoding="utf-8") as archive:
+            for row in merged.values():
+                archive.write(json.dumps(row) + "\n")
+
+    def _partition_sessions(self, table: str, partition: Dict) -> Iterator[str]:
+        """Yield the sessions with rows in a partition, paging by session_id"""
+        after_session = None
+        while True:
+            result = supabase_admin.rpc("list_partition_sessions", {
+                "parent": table,
+                "range_start": partition["range_start"],
+                "range_end": partition["range_end"],
+                "after_session": after_session,
+                "page_size": self.PAGE_SIZE
+            }).execute()
+            if not result.data:
+                return
+
+            for row in result.data:
+                yield row["session_id"]
+            after_session = result.data[-1]["session_id"]
+
+    def _session_rows(self, table: str, partition: Dict, session_id: str) -> Iterator[Dict]:
+        """Yield a session's rows in a partition, paging by id"""
+        last_id = None
+        while True:
+            query = supabase_admin.table(table).select("*").eq("session_id", session_id).gte(
+                "created_at", partition["range_start"]
+            ).lt("created_at", partition["range_end"])
+            if last_id:
+                query = query.gt("id", last_id)
+
+            # Stop on an empty page only; PostgREST max_rows may cap pages below PAGE_SIZE
+            result = query.order("id").limit(self.PAGE_SIZE).execute()
+            if not result.data:
+                return
+
+            yield from result.data
+            last_id = result.data[-1]["id"]
+
+    def _partition_dir(self, table: str, month: date) -> Path:
+        return self.archive_dir / table / f"{table}_p{month.strftime('%Y%m')}"
+
+    def _archive_path(self, table: str, month: date, session_id: str) -> Path:
+        return self._partition_dir(table, month) / f"{session_id}.jsonl.gz"
+
+    @staticmethod
+    def _parse_date(value: str) -> date:
+        return date.fromisoformat(value[:10])
+
+    @staticmethod
+    def _next_month(month: date) -> date:
+        return date(month.year + month.month // 12, month.month % 12 + 1, 1)
+
+archive_service = ArchiveService()
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    for entry in archive_service.archive_expired_partitions():
+        print(f"Archived {entry['rows']} rows from {entry['table']}.{entry['partition']}")
+    print(f"Purged archives of {archive_service.purge_deleted_sessions()} deleted sessions")
@@ -1,4 +1,5 @@
 from app.core.database import supabase, supabase_admin
+from app.services.archive_service import archive_service
 from app.models.user import UserSignup, PatientProfile
 from app.models.session import SessionCreate, FrameData, ExerciseType
 from typing import Dict, List, Optional
@@ -78,15 +79,27 @@ class DatabaseService:
             return None
         
         # Get frames and feedback
-        frames = supabase.table("frames").select("*").eq("session_id", session_id).execute()
-        feedback = supabase.table("feedback").select("*").eq("session_id", session_id).execute()
+        frames = supabase.table("frames").select("*").eq("session_id", session_id).execute().data
+        feedback = supabase.table("feedback").select("*").eq("session_id", session_id).execute().data
+        
+        # Older sessions may have some or all rows in archived partitions
+        archived_frames = archive_service.get_archived_rows("frames", session.data[0])
+        archived_feedback = archive_service.get_archived_rows("feedback", session.data[0])
+        if archived_frames or archived_feedback:
+            frames = self._merge_rows(archived_frames, frames)
+            feedback = self._merge_rows(archived_feedback, feedback)
         
         return {
             "session": session.data[0],
-            "frames": frames.data,
-            "feedback": [f["feedback_text"] for f in feedback.data]
+            "frames": frames,
+            "feedback": [f["feedback_text"] for f in feedback]
         }
     
+    def _merge_rows(self, archived: List[Dict], live: List[Dict]) -> List[Dict]:
+        """Combine archived and live rows in creation order"""
+        rows = {row["id"]: row for row in archived + live}
+        return sorted(rows.values(), key=lambda row: row["created_at"])
+    
     def get_patient_progress(self, user_id: str, days: int = 30) -> List[Dict]:
         """Get patient progress over specified days"""
         cutoff_date = (datetime.utcnow() - timedelta(days=days)).isoformat()
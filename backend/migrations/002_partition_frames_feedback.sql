@@ -0,0 +1,228 @@
+-- Range-partition frames and feedback by created_at (monthly partitions)
+-- Partitions older than ARCHIVE_RETENTION_DAYS are exported to compressed
+-- files by app.services.archive_service and then dropped.
+
+-- Helper: create monthly partitions for a parent table from start_month up to months_ahead.
+-- Rows that fell into the default partition are moved into their monthly partition
+-- so they get archived; returns the number of rows moved. Months ending on or before
+-- cutoff are never (re)created, since they may already have been archived and dropped.
+CREATE OR REPLACE FUNCTION ensure_time_partitions(
+    parent TEXT,
+    start_month DATE DEFAULT date_trunc('month', NOW())::DATE,
+    months_ahead INTEGER DEFAULT 3,
+    cutoff TIMESTAMP WITH TIME ZONE DEFAULT NULL
+) RETURNS INTEGER
+LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = public
+AS $$
+DECLARE
+    default_name TEXT := parent || '_default';
+    month_start DATE;
+    month_end DATE;
+    partition_name TEXT;
+    has_default_rows BOOLEAN;
+    moved_rows INTEGER;
+    total_moved INTEGER := 0;
+BEGIN
+    IF parent NOT IN ('frames', 'feedback') THEN
+        RAISE EXCEPTION 'Unsupported partitioned table: %', parent;
+    END IF;
+
+    FOR month_start IN EXECUTE format(
+        'SELECT generate_series(date_trunc(''month'', $1::DATE), date_trunc(''month'', NOW()) + make_interval(months => $2), INTERVAL ''1 month'')::DATE
+         UNION
+         SELECT DISTINCT date_trunc(''month'', created_at)::DATE FROM %I
+         ORDER BY 1', default_name
+    ) USING start_month, months_ahead LOOP
+        partition_name := format('%s_p%s', parent, to_char(month_start, 'YYYYMM'));
+        month_end := (month_start + INTERVAL '1 month')::DATE;
+
+        IF to_regclass(partition_name) IS NOT NULL OR month_end <= cutoff THEN
+            CONTINUE;
+        END IF;
+
+        EXECUTE format('SELECT EXISTS (SELECT 1 FROM %I WHERE created_at >= $1 AND created_at < $2)', default_name)
+            INTO has_default_rows USING month_start, month_end;
+
+        IF NOT has_default_rows THEN
+            EXECUTE format(
+                'CREATE TABLE %I PARTITION OF %I FOR VALUES FROM (%L) TO (%L)',
+                partition_name, parent, month_start, month_end
+            );
+            -- Parent policies do not apply to direct partition access, so deny it
+            EXECUTE format('ALTER TABLE %I ENABLE ROW LEVEL SECURITY', partition_name);
+            CONTINUE;
+        END IF;
+
+        -- A partition cannot be created over rows in the default partition, so move them first
+        EXECUTE format('CREATE TABLE %I (LIKE %I INCLUDING DEFAULTS INCLUDING CONSTRAINTS)', partition_name, parent);
+        EXECUTE format('ALTER TABLE %I ENABLE ROW LEVEL SECURITY', partition_name);
+        EXECUTE format(
+            'WITH moved AS (DELETE FROM %I WHERE created_at >= $1 AND created_at < $2 RETURNING *) INSERT INTO %I SELECT * FROM moved',
+            default_name, partition_name
+        ) USING month_start, month_end;
+        GET DIAGNOSTICS moved_rows = ROW_COUNT;
+        EXECUTE format(
+            'ALTER TABLE %I ATTACH PARTITION %I FOR VALUES FROM (%L) TO (%L)',
+            parent, partition_name, month_start, month_end
+        );
+        total_moved := total_moved + moved_rows;
+    END LOOP;
+
+    RETURN total_moved;
+END;
+$$;
+
+-- Helper: list partitions whose whole range ends on or before cutoff
+CREATE OR REPLACE FUNCTION list_expired_partitions(parent TEXT, cutoff TIMESTAMP WITH TIME ZONE)
+RETURNS TABLE (partition_name TEXT, range_start DATE, range_end DATE)
+LANGUAGE sql
+STABLE
+SECURITY DEFINER
+SET search_path = public
+AS $$
+    SELECT child.relname::TEXT,
+           to_date(right(child.relname, 6), 'YYYYMM'),
+           (to_date(right(child.relname, 6), 'YYYYMM') + INTERVAL '1 month')::DATE
+    FROM pg_inherits
+    JOIN pg_class parent_rel ON parent_rel.oid = pg_inherits.inhparent
+    JOIN pg_class child ON child.oid = pg_inherits.inhrelid
+    WHERE parent_rel.relname = parent
+      AND child.relname ~ ('^' || parent || '_p[0-9]{6}$')
+      AND (to_date(right(child.relname, 6), 'YYYYMM') + INTERVAL '1 month') <= cutoff
+    ORDER BY 2;
+$$;
+
+-- Helper: page through the distinct sessions with rows in a partition's range
+CREATE OR REPLACE FUNCTION list_partition_sessions(
+    parent TEXT,
+    range_start DATE,
+    range_end DATE,
+    after_session UUID DEFAULT NULL,
+    page_size INTEGER DEFAULT 1000
+) RETURNS TABLE (session_id UUID)
+LANGUAGE plpgsql
+STABLE
+SECURITY DEFINER
+SET search_path = public
+AS $$
+BEGIN
+    IF parent NOT IN ('frames', 'feedback') THEN
+        RAISE EXCEPTION 'Unsupported partitioned table: %', parent;
+    END IF;
+
+    RETURN QUERY EXECUTE format(
+        'SELECT DISTINCT session_id FROM %I
+         WHERE created_at >= $1 AND created_at < $2 AND ($3 IS NULL OR session_id > $3)
+         ORDER BY session_id LIMIT $4', parent
+    ) USING range_start, range_end, after_session, page_size;
+END;
+$$;
+
+-- Helper: detach and drop a partition once it has been archived.
+-- DETACH takes an ACCESS EXCLUSIVE lock on the parent table (CONCURRENTLY is not
+-- allowed inside a function), so give up quickly instead of stalling live inserts.
+CREATE OR REPLACE FUNCTION drop_time_partition(parent TEXT, partition_name TEXT)
+RETURNS VOID
+LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = public
+AS $$
+BEGIN
+    IF parent NOT IN ('frames', 'feedback') OR partition_name !~ ('^' || parent || '_p[0-9]{6}$') THEN
+        RAISE EXCEPTION 'Refusing to drop %.%', parent, partition_name;
+    END IF;
+
+    SET LOCAL lock_timeout = '5s';
+    EXECUTE format('ALTER TABLE %I DETACH PARTITION %I', parent, partition_name);
+    EXECUTE format('DROP TABLE %I', partition_name);
+END;
+$$;
+
+-- Partition management is restricted to the service role (retention job)
+REVOKE ALL ON FUNCTION ensure_time_partitions(TEXT, DATE, INTEGER, TIMESTAMP WITH TIME ZONE) FROM PUBLIC, anon, authenticated;
+REVOKE ALL ON FUNCTION list_expired_partitions(TEXT, TIMESTAMP WITH TIME ZONE) FROM PUBLIC, anon, authenticated;
+REVOKE ALL ON FUNCTION list_partition_sessions(TEXT, DATE, DATE, UUID, INTEGER) FROM PUBLIC, anon, authenticated;
+REVOKE ALL ON FUNCTION drop_time_partition(TEXT, TEXT) FROM PUBLIC, anon, authenticated;
+GRANT EXECUTE ON FUNCTION ensure_time_partitions(TEXT, DATE, INTEGER, TIMESTAMP WITH TIME ZONE) TO service_role;
+GRANT EXECUTE ON FUNCTION list_expired_partitions(TEXT, TIMESTAMP WITH TIME ZONE) TO service_role;
+GRANT EXECUTE ON FUNCTION list_partition_sessions(TEXT, DATE, DATE, UUID, INTEGER) TO service_role;
+GRANT EXECUTE ON FUNCTION drop_time_partition(TEXT, TEXT) TO service_role;
+
+-- The backfill below runs in one transaction and blocks frame and feedback
+-- writes until it commits; run it during a maintenance window.
+BEGIN;
+
+-- Keep existing rows while the partitioned tables are built
+ALTER TABLE frames RENAME TO frames_legacy;
+ALTER TABLE feedback RENAME TO feedback_legacy;
+
+-- Frame data for each session (partitioned by created_at)
+CREATE TABLE frames (
+    id UUID NOT NULL DEFAULT uuid_generate_v4(),
+    session_id UUID NOT NULL REFERENCES sessions(id) ON DELETE CASCADE,
+    angles JSONB NOT NULL, -- Store joint angles as JSON
+    stage VARCHAR(50) NOT NULL,
+    rep_count INTEGER NOT NULL,
+    timestamp DECIMAL(15,3) NOT NULL, -- Timestamp within session
+    created_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT NOW(),
+    PRIMARY KEY (id, created_at)
+) PARTITION BY RANGE (created_at);
+
+-- AI feedback for sessions (partitioned by created_at)
+CREATE TABLE feedback (
+    id UUID NOT NULL DEFAULT uuid_generate_v4(),
+    session_id UUID NOT NULL REFERENCES sessions(id) ON DELETE CASCADE,
+    feedback_text TEXT NOT NULL,
+    created_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT NOW(),
+    PRIMARY KEY (id, created_at)
+) PARTITION BY RANGE (created_at);
+
+-- Catch rows outside any monthly partition instead of failing the insert;
+-- ensure_time_partitions moves them into a monthly partition on the next run
+-- unless that month is past the retention cutoff (the retention job reports those)
+CREATE TABLE frames_default PARTITION OF frames DEFAULT;
+CREATE TABLE feedback_default PARTITION OF feedback DEFAULT;
+ALTER TABLE frames_default ENABLE ROW LEVEL SECURITY;
+ALTER TABLE feedback_default ENABLE ROW LEVEL SECURITY;
+
+-- Monthly partitions covering existing data plus the next three months
+SELECT ensure_time_partitions('frames', COALESCE((SELECT MIN(created_at) FROM frames_legacy), NOW())::DATE);
+SELECT ensure_time_partitions('feedback', COALESCE((SELECT MIN(created_at) FROM feedback_legacy), NOW())::DATE);
+
+INSERT INTO frames (id, session_id, angles, stage, rep_count, timestamp, created_at)
+SELECT id, session_id, angles, stage, rep_count, timestamp, COALESCE(created_at, NOW()) FROM frames_legacy;
+
+INSERT INTO feedback (id, session_id, feedback_text, created_at)
+SELECT id, session_id, feedback_text, COALESCE(created_at, NOW()) FROM feedback_legacy;
+
+DROP TABLE frames_legacy;
+DROP TABLE feedback_legacy;
+
+-- Indexes (created on every partition)
+CREATE INDEX idx_frames_session_id ON frames(session_id);
+CREATE INDEX idx_frames_created_at ON frames USING BRIN (created_at);
+CREATE INDEX idx_feedback_session_id ON feedback(session_id);
+CREATE INDEX idx_feedback_created_at ON feedback USING BRIN (created_at);
+
+-- Row Level Security (RLS) policies
+ALTER TABLE frames ENABLE ROW LEVEL SECURITY;
+ALTER TABLE feedback ENABLE ROW LEVEL SECURITY;
+
+-- Frames access control
+-- The session list is evaluated once per query instead of an EXISTS per row
+CREATE POLICY "Users can view own session frames" ON frames FOR SELECT USING (
+    session_id IN (SELECT id FROM sessions WHERE user_id = (SELECT auth.uid()))
+);
+CREATE POLICY "Users can insert own session frames" ON frames FOR INSERT WITH CHECK (
+    session_id IN (SELECT id FROM sessions WHERE user_id = (SELECT auth.uid()))
+);
+
+-- Feedback access control
+CREATE POLICY "Users can view own session feedback" ON feedback FOR SELECT USING (
+    session_id IN (SELECT id FROM sessions WHERE user_id = (SELECT auth.uid()))
+);
+CREATE POLICY "System can insert feedback" ON feedback FOR INSERT WITH CHECK (true);
+
+COMMIT;
@@ -0,0 +1,212 @@
+import gzip
+import json
+from datetime import date, datetime, timedelta
+from types import SimpleNamespace
+
+from postgrest.exceptions import APIError
+from app.services import archive_service as archive_module
+from app.services.archive_service import ArchiveService
+from app.services.database_service import DatabaseService
+
+PARTITION = {"partition_name": "frames_p202401", "range_start": "2024-01-01", "range_end": "2024-02-01"}
+
+class FakeQuery:
+    """Minimal stand-in for a PostgREST query builder over in-memory rows"""
+
+    def __init__(self, rows, max_rows, count_offset):
+        self.rows = rows
+        self.max_rows = max_rows
+        self.count_offset = count_offset
+        self.filters = []
+        self.row_limit = None
+        self.count = None
+
+    def select(self, *columns, count=None):
+        self.count = count
+        return self
+
+    def eq(self, column, value):
+        self.filters.append(lambda row: row[column] == value)
+        return self
+
+    def gt(self, column, value):
+        self.filters.append(lambda row: row[column] > value)
+        return self
+
+    def gte(self, column, value):
+        self.filters.append(lambda row: row[column] >= value)
+        return self
+
+    def lt(self, column, value):
+        self.filters.append(lambda row: row[column] < value)
+        return self
+
+    def in_(self, column, values):
+        self.filters.append(lambda row: row[column] in values)
+        return self
+
+    def order(self, column):
+        self.rows = sorted(self.rows, key=lambda row: row[column])
+        return self
+
+    def limit(self, size):
+        self.row_limit = size
+        return self
+
+    def execute(self):
+        matched = [row for row in self.rows if all(f(row) for f in self.filters)]
+        page = matched[:min(self.row_limit or self.max_rows, self.max_rows)]
+        count = len(matched) + self.count_offset if self.count else None
+        return SimpleNamespace(data=page, count=count)
+
+class FakeSupabase:
+    def __init__(self, tables, max_rows=1000, count_offset=0, drop_error=False):
+        self.tables = tables
+        self.max_rows = max_rows
+        self.count_offset = count_offset
+        self.drop_error = drop_error
+        self.rpc_calls = []
+
+    def table(self, name):
+        return FakeQuery(self.tables.get(name, []), self.max_rows, self.count_offset)
+
+    def rpc(self, name, params):
+        self.rpc_calls.append((name, params))
+        if name == "drop_time_partition" and self.drop_error:
+            raise APIError({"message": "canceling statement due to lock timeout", "code": "55P03"})
+        if name == "list_expired_partitions":
+            data = [PARTITION] if params["parent"] == "frames" else []
+        elif name == "list_partition_sessions":
+            session_ids = sorted({
+                row["session_id"] for row in self.tables[params["parent"]]
+                if params["range_start"] <= row["created_at"] < params["range_end"]
+                and (params["after_session"] is None or row["session_id"] > params["after_session"])
+            })
+            data = [{"session_id": session_id} for session_id in session_ids[:min(params["page_size"], self.max_rows)]]
+        else:
+            data = 0 if name == "ensure_time_partitions" else None
+        return SimpleNamespace(execute=lambda: SimpleNamespace(data=data))
+
+    def dropped(self):
+        return [params["partition_name"] for name, params in self.rpc_calls if name == "drop_time_partition"]
+
+    def called(self, rpc_name):
+        return [params for name, params in self.rpc_calls if name == rpc_name]
+
+def make_frames(session_id, count, created_at="2024-01-15T10:00:00+00:00"):
+    return [
+        {"id": f"{session_id}-{i:04d}", "session_id": session_id, "rep_count": i, "created_at": created_at}
+        for i in range(count)
+    ]
+
+def write_archive(path, rows):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with gzip.open(path, "wt", encoding="utf-8") as archive:
+        for row in rows:
+            archive.write(json.dumps(row) + "\n")
+
+def test_next_month_rolls_over_december():
+    assert ArchiveService._next_month(date(2024, 12, 1)) == date(2025, 1, 1)
+    assert ArchiveService._next_month(date(2024, 11, 1)) == date(2024, 12, 1)
+
+def test_archive_path(tmp_path):
+    service = ArchiveService(archive_dir=str(tmp_path), retention_days=30)
+    path = service._archive_path("frames", date(2024, 3, 1), "abc")
+    assert path == tmp_path / "frames" / "frames_p202403" / "abc.jsonl.gz"
+
+def test_get_archived_rows_reads_every_archived_month_of_session(tmp_path):
+    service = ArchiveService(archive_dir=str(tmp_path), retention_days=30)
+    for month in (date(2023, 12, 1), date(2024, 1, 1), date(2024, 6, 1)):
+        write_archive(service._archive_path("frames", month, "s1"), [{"id": month.isoformat(), "session_id": "s1"}])
+    write_archive(service._archive_path("frames", date(2024, 1, 1), "s2"), [{"id": "other", "session_id": "s2"}])
+    write_archive(tmp_path / "frames" / "frames_p202402.tmp" / "s1.jsonl.gz", [{"id": "partial", "session_id": "s1"}])
+
+    session = {"id": "s1", "start_time": "2023-12-31T23:50:00+00:00", "end_time": None}
+    rows = service.get_archived_rows("frames", session)
+
+    assert [row["id"] for row in rows] == ["2023-12-01", "2024-01-01", "2024-06-01"]
+
+def test_get_archived_rows_inside_retention_window(tmp_path):
+    service = ArchiveService(archive_dir=str(tmp_path), retention_days=30)
+    start = datetime.utcnow() - timedelta(days=1)
+    month = date(start.year, start.month, 1)
+    write_archive(service._archive_path("frames", month, "s1"), [{"id": "1", "session_id": "s1"}])
+
+    assert service.get_archived_rows("frames", {"id": "s1", "start_time": start.isoformat()}) == []
+
+def test_merge_rows_dedupes_and_sorts():
+    archived = [{"id": "b", "created_at": "2024-01-02"}, {"id": "a", "created_at": "2024-01-01"}]
+    live = [{"id": "c", "created_at": "2024-01-03"}, {"id": "b", "created_at": "2024-01-02"}]
+
+    merged = DatabaseService()._merge_rows(archived, live)
+
+    assert [row["id"] for row in merged] == ["a", "b", "c"]
+
+def test_export_pages_past_short_pages_and_drops(tmp_path, monkeypatch):
+    fake = FakeSupabase({"frames": make_frames("s1", 5) + make_frames("s2", 3)}, max_rows=2)
+    monkeypatch.setattr(archive_module, "supabase_admin", fake)
+    service = ArchiveService(archive_dir=str(tmp_path), retention_days=30)
+
+    archived = service.archive_expired_partitions()
+
+    assert archived == [{"table": "frames", "partition": "frames_p202401", "rows": 8}]
+    assert fake.dropped() == ["frames_p202401"]
+    with gzip.open(service._archive_path("frames", date(2024, 1, 1), "s1"), "rt") as archive:
+        assert len(archive.readlines()) == 5
+
+def test_rearchiving_a_month_merges_with_existing_archive(tmp_path, monkeypatch):
+    service = ArchiveService(archive_dir=str(tmp_path), retention_days=30)
+    monkeypatch.setattr(archive_module, "supabase_admin", FakeSupabase({"frames": make_frames("s1", 5)}))
+    service.archive_expired_partitions()
+
+    # Same month again, e.g. a late row moved out of the default partition
+    fake = FakeSupabase({"frames": make_frames("s2", 1)})
+    monkeypatch.setattr(archive_module, "supabase_admin", fake)
+    service.archive_expired_partitions()
+
+    with gzip.open(service._archive_path("frames", date(2024, 1, 1), "s1"), "rt") as archive:
+        assert len(archive.readlines()) == 5
+    with gzip.open(service._archive_path("frames", date(2024, 1, 1), "s2"), "rt") as archive:
+        assert len(archive.readlines()) == 1
+    assert fake.called("ensure_time_partitions")[0]["cutoff"]
+
+def test_rearchiving_a_session_file_dedupes_rows(tmp_path, monkeypatch):
+    service = ArchiveService(archive_dir=str(tmp_path), retention_days=30)
+    monkeypatch.setattr(archive_module, "supabase_admin", FakeSupabase({"frames": make_frames("s1", 3)}))
+    service.archive_expired_partitions()
+    monkeypatch.setattr(archive_module, "supabase_admin", FakeSupabase({"frames": make_frames("s1", 5)}))
+    service.archive_expired_partitions()
+
+    with gzip.open(service._archive_path("frames", date(2024, 1, 1), "s1"), "rt") as archive:
+        assert len(archive.readlines()) == 5
+
+def test_failed_drop_does_not_stop_the_job(tmp_path, monkeypatch):
+    fake = FakeSupabase({"frames": make_frames("s1", 5), "feedback": []}, drop_error=True)
+    monkeypatch.setattr(archive_module, "supabase_admin", fake)
+    service = ArchiveService(archive_dir=str(tmp_path), retention_days=30)
+
+    assert service.archive_expired_partitions() == []
+    assert [params["parent"] for params in fake.called("list_expired_partitions")] == ["frames", "feedback"]
+    assert service._archive_path("frames", date(2024, 1, 1), "s1").exists()
+
+def test_mismatched_export_does_not_drop(tmp_path, monkeypatch):
+    fake = FakeSupabase({"frames": make_frames("s1", 5)}, count_offset=1)
+    monkeypatch.setattr(archive_module, "supabase_admin", fake)
+    service = ArchiveService(archive_dir=str(tmp_path), retention_days=30)
+
+    assert service.archive_expired_partitions() == []
+    assert fake.dropped() == []
+    assert not service._archive_path("frames", date(2024, 1, 1), "s1").parent.exists()
+
+def test_purge_deleted_sessions(tmp_path, monkeypatch):
+    fake = FakeSupabase({"sessions": [{"id": "kept"}]})
+    monkeypatch.setattr(archive_module, "supabase_admin", fake)
+    service = ArchiveService(archive_dir=str(tmp_path), retention_days=30)
+    kept = service._archive_path("frames", date(2024, 1, 1), "kept")
+    deleted = service._archive_path("feedback", date(2024, 1, 1), "deleted")
+    write_archive(kept, [{"id": "1"}])
+    write_archive(deleted, [{"id": "2"}])
+
+    assert service.purge_deleted_sessions() == 1
+    assert kept.exists()
+    assert not deleted.exists()